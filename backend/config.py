@@ -0,0 +1,195 @@
+"""Secret Manager access and database engine setup for the ingestion function."""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cachetools
+from google.cloud import secretmanager
+from sqlalchemy import create_engine, event, text
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ID = os.environ.get("GCP_PROJECT", "health-data-hub")
+
+DB_SECRETS = ("db-server", "db-name", "db-username", "db-password")
+
+# Shared Secret Manager client so every fetch reuses one gRPC channel
+# instead of paying a TLS handshake per call.
+_sm_client = None
+_sm_client_lock = threading.Lock()
+
+_db_engine = None
+_engine_lock = threading.Lock()
+_engine_ready = threading.Event()
+
+
+def _get_sm_client():
+    """Return the process-wide Secret Manager client, creating it lazily.
+
+    Locked because the cold-start path fans get_secret() out over a
+    thread pool; without it each worker could build its own client.
+    """
+    global _sm_client
+    if _sm_client is None:
+        with _sm_client_lock:
+            if _sm_client is None:
+                _sm_client = secretmanager.SecretManagerServiceClient()
+    return _sm_client
+
+
+def _fetch_secret(client, secret_id, version_id="latest"):
+    name = f"projects/{PROJECT_ID}/secrets/{secret_id}/versions/{version_id}"
+    response = client.access_secret_version(request={"name": name})
+    return response.payload.data.decode("UTF-8")
+
+
+# Secrets rotate rarely; an hour-long TTL keeps warm invocations (and any
+# engine re-creation after a pool failure) off the Secret Manager API.
+_secret_cache = cachetools.TTLCache(maxsize=16, ttl=3600)
+_secret_cache_lock = threading.Lock()
+
+
+def get_secret(secret_id, version_id="latest"):
+    """Fetch a single secret payload, caching it for an hour.
+
+    The lock only guards cache access, not the network call, so
+    concurrent fetches of different secrets do not serialize on RPC
+    latency.
+    """
+    key = (PROJECT_ID, secret_id, version_id)
+    with _secret_cache_lock:
+        value = _secret_cache.get(key)
+    if value is not None:
+        return value
+
+    value = _fetch_secret(_get_sm_client(), secret_id, version_id)
+    with _secret_cache_lock:
+        _secret_cache[key] = value
+    return value
+
+
+def get_database_url():
+    """Build the Azure SQL connection URL from Secret Manager values.
+
+    The four secrets are fetched concurrently on a shared client: each
+    access is a ~100ms RPC, so fanning out collapses the cold-start cost
+    to a single round trip.
+    """
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = {
+            secret_id: executor.submit(get_secret, secret_id)
+            for secret_id in DB_SECRETS
+        }
+        secrets = {secret_id: future.result() for secret_id, future in futures.items()}
+
+    return (
+        "mssql+pyodbc://{username}:{password}@{server}:1433/{database}"
+        "?driver=ODBC+Driver+18+for+SQL+Server"
+    ).format(
+        username=secrets["db-username"],
+        password=secrets["db-password"],
+        server=secrets["db-server"],
+        database=secrets["db-name"],
+    )
+
+
+def create_db_engine():
+    """Create the SQLAlchemy engine with connection pooling."""
+    database_url = get_database_url()
+    # Each instance serves one request at a time, so one pooled
+    # connection (plus a little overflow headroom) matches actual
+    # concurrency; larger pools just hold idle sockets against Azure
+    # SQL's connection cap across many instances.
+    engine = create_engine(
+        database_url,
+        pool_size=1,
+        max_overflow=2,
+        pool_timeout=10,
+        pool_use_lifo=True,
+        # No pre-ping: with one checkout per invocation the ping doubled
+        # the initial round trip. Recycling faster than Azure SQL's idle
+        # timeout replaces stale connections on age instead; the merge
+        # path retries once if a dead socket slips through.
+        pool_pre_ping=False,
+        pool_recycle=300,
+        echo=False,
+    )
+
+    @event.listens_for(engine, "connect")
+    def receive_pool_connect(dbapi_connection, connection_record):
+        logger.info("New database connection established: %s", id(dbapi_connection))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def receive_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # Let pyodbc send executemany parameter arrays in one TDS batch
+        # instead of a round trip per parameter set.
+        if executemany:
+            cursor.fast_executemany = True
+
+    # Open and return one pooled connection now so the first real query
+    # hits a live socket instead of paying the TCP/TLS/login handshake.
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    return engine
+
+
+def get_db_engine():
+    """Return the process-wide engine, creating it on first use.
+
+    Normally the warm-up thread spawned at import has already built the
+    engine; the first request only blocks on the event for whatever init
+    time remains. The wait is bounded so a process whose warm-up never
+    ran (or died) falls back to creating the engine inline, and if
+    warm-up failed, creation is retried here.
+    """
+    global _db_engine
+    _engine_ready.wait(timeout=30)
+    if _db_engine is None:
+        with _engine_lock:
+            if _db_engine is None:
+                logger.info("Creating database engine")
+                _db_engine = create_db_engine()
+    return _db_engine
+
+
+def _warm_engine():
+    """Build the engine (and its prewarmed connection) off the request path."""
+    global _db_engine
+    try:
+        with _engine_lock:
+            if _db_engine is None:
+                logger.info("Warming database engine")
+                _db_engine = create_db_engine()
+    except Exception:
+        logger.exception("Engine warm-up failed; first request will retry")
+    finally:
+        _engine_ready.set()
+
+
+def _reinit_engine_after_fork():
+    """Reset engine state in a forked worker.
+
+    Engine pools are not fork-safe: a child must not reuse the parent's
+    connections. dispose(close=False) discards the pool references while
+    leaving the parent's sockets untouched, so each worker opens fresh
+    connections but still inherits config, cached secrets and metadata.
+
+    Fork clones only the calling thread, so a child forked while the
+    parent's warm-up thread was still running inherits an unset
+    _engine_ready event and no thread to ever set it. Restart warm-up in
+    that case or every request would block on the event.
+    """
+    if _db_engine is not None:
+        _db_engine.dispose(close=False)
+    if not _engine_ready.is_set():
+        threading.Thread(target=_warm_engine, daemon=True).start()
+
+
+os.register_at_fork(after_in_child=_reinit_engine_after_fork)
+
+# Kick off engine construction (secret fetch, pool setup, first checkout)
+# as soon as the module loads so the first request doesn't pay for it.
+threading.Thread(target=_warm_engine, daemon=True).start()
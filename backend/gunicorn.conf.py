@@ -0,0 +1,8 @@
+"""Gunicorn settings for running the function on Cloud Run / Functions gen2."""
+
+# Import the app once in the master before forking so workers inherit the
+# parsed config, Secret Manager client, cached secrets and engine setup
+# copy-on-write instead of paying cold-start cost per worker. config.py
+# registers an after-fork hook that re-opens the (non-fork-safe) pool
+# sockets per worker.
+preload_app = True
@@ -0,0 +1,285 @@
+"""HTTP entry point for the uploadHealthMetrics ingestion function."""
+
+import functools
+import logging
+import time
+import uuid
+
+import functions_framework
+import orjson
+from flask import Response
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from config import get_db_engine
+from validation import validate_batch
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 500
+
+# SQL Server caps a statement at 2100 bound parameters; at 20 parameters
+# per row, 100 rows per MERGE stays comfortably under the limit.
+MERGE_CHUNK_SIZE = 100
+
+# (health_data column, bound-parameter stem) in source-row order.
+MERGE_COLUMNS = (
+    ('UserId', 'user_id'),
+    ('DeviceId', 'device_id'),
+    ('Timestamp', 'timestamp'),
+    ('HeartRate', 'heart_rate'),
+    ('BpSystolic', 'bp_systolic'),
+    ('BpDiastolic', 'bp_diastolic'),
+    ('SpO2', 'sp_o2'),
+    ('Steps', 'steps'),
+    ('Calories', 'calories'),
+    ('Distance', 'distance'),
+    ('Temperature', 'temperature'),
+    ('BloodGlucose', 'blood_glucose'),
+    ('TotalSleep', 'total_sleep'),
+    ('DeepSleep', 'deep_sleep'),
+    ('LightSleep', 'light_sleep'),
+    ('Stress', 'stress'),
+    ('Met', 'met'),
+    ('Mai', 'mai'),
+    ('IsWearing', 'is_wearing'),
+    ('RecordHash', 'record_hash'),
+)
+
+MERGE_UPDATE_COLUMNS = tuple(
+    column for column, _ in MERGE_COLUMNS
+    if column not in ('UserId', 'DeviceId', 'Timestamp')
+)
+
+
+@functools.lru_cache(maxsize=8)
+def _build_merge_sql(row_count):
+    """Build the TVC MERGE for row_count rows as a prepared TextClause.
+
+    Every full chunk shares one statement, so the text is assembled and
+    parsed once per distinct chunk size instead of once per execute.
+    """
+    rows = ",\n       ".join(
+        "(" + ", ".join(f":{param}_{i}" for _, param in MERGE_COLUMNS) + ")"
+        for i in range(row_count)
+    )
+    source_columns = ", ".join(column for column, _ in MERGE_COLUMNS)
+    update_set = ", ".join(f"{column} = source.{column}" for column in MERGE_UPDATE_COLUMNS)
+    insert_values = ", ".join(f"source.{column}" for column, _ in MERGE_COLUMNS)
+    return text(f"""
+MERGE INTO health_data WITH (TABLOCK) AS target
+USING (VALUES
+       {rows}) AS source ({source_columns})
+ON target.UserId = source.UserId
+   AND target.DeviceId = source.DeviceId
+   AND target.Timestamp = source.Timestamp
+WHEN MATCHED AND target.RecordHash <> source.RecordHash THEN
+    UPDATE SET {update_set}
+WHEN NOT MATCHED THEN
+    INSERT ({source_columns})
+    VALUES ({insert_values});
+""")
+
+
+def _batch_timestamps(metrics):
+    """Convert every epoch-millis timestamp to datetime in one C-level pass."""
+    ts_ms = np.fromiter(
+        (metric['timestamp'] for metric in metrics),
+        dtype=np.int64, count=len(metrics),
+    )
+    return ts_ms.astype('datetime64[ms]').astype(object)
+
+
+def _build_row_params(metric, timestamp):
+    """Map one request metric onto the MERGE bound-parameter stems."""
+    return {
+        'user_id': metric['userId'],
+        'device_id': metric['deviceId'],
+        'timestamp': timestamp,
+        'heart_rate': metric.get('heartRate'),
+        'bp_systolic': metric.get('bpSystolic'),
+        'bp_diastolic': metric.get('bpDiastolic'),
+        'sp_o2': metric.get('spO2'),
+        'steps': metric.get('steps'),
+        'calories': metric.get('calories'),
+        'distance': metric.get('distance'),
+        'temperature': metric.get('temperature'),
+        'blood_glucose': metric.get('bloodGlucose'),
+        'total_sleep': metric.get('totalSleep'),
+        'deep_sleep': metric.get('deepSleep'),
+        'light_sleep': metric.get('lightSleep'),
+        'stress': metric.get('stress'),
+        'met': metric.get('met'),
+        'mai': metric.get('mai'),
+        'is_wearing': metric['isWearing'],
+        'record_hash': metric['recordHash'],
+    }
+
+
+def _is_disconnect(error):
+    """True when the error means the connection itself is gone.
+
+    Such errors must propagate to the retry wrapper rather than being
+    treated as bad records: once the connection is invalidated, every
+    later statement fails with PendingRollbackError anyway.
+    """
+    return isinstance(error, DBAPIError) and (
+        isinstance(error, OperationalError) or error.connection_invalidated)
+
+
+def _merge_rows_individually(conn, chunk, timestamps, start, correlation_id, errors):
+    """Per-row fallback for a failed chunk, each row under its own savepoint."""
+    synced = 0
+    single_row_stmt = _build_merge_sql(1)
+    for i, metric in enumerate(chunk):
+        row = _build_row_params(metric, timestamps[start + i])
+        params = {f'{param}_0': row[param] for _, param in MERGE_COLUMNS}
+        try:
+            with conn.begin_nested():
+                conn.execute(single_row_stmt, params)
+            synced += 1
+        except Exception as e:
+            if _is_disconnect(e):
+                raise
+            errors.append(f"Record {start + i}: {e}")
+            logger.error("[%s] Record %d failed: %s", correlation_id, start + i, e)
+    return synced
+
+
+def _merge_batch(engine, metrics, correlation_id):
+    """MERGE the batch into health_data, returning (synced, errors).
+
+    Runs on a raw Core connection — the path only executes text()
+    statements, so ORM session machinery buys nothing here. Rows are
+    grouped into table-value-constructor chunks so a 500-record batch
+    costs a handful of round trips to Azure SQL instead of 500. Each
+    chunk runs under a savepoint: a failed chunk rolls back to the
+    savepoint and is retried row by row, so one bad record never poisons
+    the outer transaction or costs the rest of the batch.
+    """
+    synced = 0
+    errors = []
+    timestamps = _batch_timestamps(metrics)
+
+    with engine.begin() as conn:
+        for start in range(0, len(metrics), MERGE_CHUNK_SIZE):
+            chunk = metrics[start:start + MERGE_CHUNK_SIZE]
+            params = {}
+            for i, metric in enumerate(chunk):
+                row = _build_row_params(metric, timestamps[start + i])
+                for _, param in MERGE_COLUMNS:
+                    params[f'{param}_{i}'] = row[param]
+            try:
+                with conn.begin_nested():
+                    conn.execute(_build_merge_sql(len(chunk)), params)
+                synced += len(chunk)
+            except Exception as e:
+                if _is_disconnect(e):
+                    raise
+                logger.error("[%s] Merge chunk at offset %d failed, retrying per row: %s",
+                             correlation_id, start, e)
+                synced += _merge_rows_individually(
+                    conn, chunk, timestamps, start, correlation_id, errors)
+
+    return synced, errors
+
+
+def insert_or_update_metrics(engine, metrics, correlation_id):
+    """Merge the batch, retrying once if the pooled connection went stale.
+
+    The pool does not pre-ping, so a connection idle past the server's
+    timeout surfaces here as an invalidated-connection error on first
+    use; disposing the pool and retrying gets a fresh socket.
+    """
+    try:
+        return _merge_batch(engine, metrics, correlation_id)
+    except DBAPIError as e:
+        if not _is_disconnect(e):
+            raise
+        logger.warning("[%s] Stale connection, disposing pool and retrying batch: %s",
+                       correlation_id, e)
+        engine.dispose()
+        return _merge_batch(engine, metrics, correlation_id)
+
+
+def json_response(obj, status=200):
+    """Encode obj with orjson into a JSON Response."""
+    return Response(orjson.dumps(obj), status=status, content_type='application/json')
+
+
+@functions_framework.http
+def upload_health_metrics(request):
+    """Receive a batch of health metrics from the app and upsert them."""
+    start_time = time.time()
+    correlation_id = request.headers.get('X-Correlation-ID', str(uuid.uuid4()))
+
+    if request.method != 'POST':
+        return json_response({'success': False, 'errors': ['Method not allowed']}, status=405)
+
+    try:
+        data = orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        data = None
+    if not isinstance(data, dict) or 'metrics' not in data:
+        return json_response({
+            'success': False,
+            'syncedCount': 0,
+            'failedCount': 0,
+            'durationMs': int((time.time() - start_time) * 1000),
+            'correlationId': correlation_id,
+            'errors': ['Request body must contain a metrics array'],
+        }, status=400)
+
+    metrics = data['metrics']
+    if len(metrics) > MAX_BATCH_SIZE:
+        return json_response({
+            'success': False,
+            'syncedCount': 0,
+            'failedCount': len(metrics),
+            'durationMs': int((time.time() - start_time) * 1000),
+            'correlationId': correlation_id,
+            'errors': [f'Batch size {len(metrics)} exceeds maximum of {MAX_BATCH_SIZE}'],
+        }, status=400)
+
+    validation_errors = validate_batch(metrics)
+    if validation_errors:
+        logger.warning(f"[{correlation_id}] Validation failed with {len(validation_errors)} errors")
+        return json_response({
+            'success': False,
+            'syncedCount': 0,
+            'failedCount': len(metrics),
+            'durationMs': int((time.time() - start_time) * 1000),
+            'correlationId': correlation_id,
+            'errors': validation_errors,
+        }, status=400)
+
+    # Client retries can resend rows the server already saw in the same
+    # batch; keep the last occurrence per MERGE ON key so one TVC chunk
+    # never carries two source rows for the same target row (which would
+    # double-insert a missing row or fail the MERGE on an existing one).
+    # The hash stays out of the key: WHEN MATCHED compares it anyway.
+    deduped = {}
+    for metric in metrics:
+        key = (metric['userId'], metric['deviceId'], metric['timestamp'])
+        deduped[key] = metric
+    if len(deduped) != len(metrics):
+        logger.info(f"[{correlation_id}] Dropped {len(metrics) - len(deduped)} duplicate records")
+        metrics = list(deduped.values())
+
+    logger.info(f"[{correlation_id}] Processing batch of {len(metrics)} metrics")
+
+    synced, merge_errors = insert_or_update_metrics(get_db_engine(), metrics, correlation_id)
+
+    duration_ms = int((time.time() - start_time) * 1000)
+    logger.info(f"[{correlation_id}] Synced {synced}/{len(metrics)} metrics in {duration_ms}ms")
+
+    return json_response({
+        'success': not merge_errors,
+        'syncedCount': synced,
+        'failedCount': len(metrics) - synced,
+        'durationMs': duration_ms,
+        'correlationId': correlation_id,
+        'errors': merge_errors or None,
+    })
@@ -0,0 +1,34 @@
+"""ORM model for the health_data table in Azure SQL."""
+
+from sqlalchemy import Boolean, Column, DateTime, Float, Integer, String
+from sqlalchemy.orm import declarative_base
+
+Base = declarative_base()
+
+
+class HealthMetric(Base):
+    """One aggregated 5-minute health snapshot uploaded by the app."""
+
+    __tablename__ = "health_data"
+
+    id = Column("Id", Integer, primary_key=True, autoincrement=True)
+    user_id = Column("UserId", String(64), nullable=False)
+    device_id = Column("DeviceId", String(64), nullable=False)
+    timestamp = Column("Timestamp", DateTime, nullable=False)
+    heart_rate = Column("HeartRate", Integer)
+    bp_systolic = Column("BpSystolic", Integer)
+    bp_diastolic = Column("BpDiastolic", Integer)
+    sp_o2 = Column("SpO2", Integer)
+    steps = Column("Steps", Integer)
+    calories = Column("Calories", Integer)
+    distance = Column("Distance", Integer)
+    temperature = Column("Temperature", Float)
+    blood_glucose = Column("BloodGlucose", Float)
+    total_sleep = Column("TotalSleep", Integer)
+    deep_sleep = Column("DeepSleep", Integer)
+    light_sleep = Column("LightSleep", Integer)
+    stress = Column("Stress", Integer)
+    met = Column("Met", Float)
+    mai = Column("Mai", Integer)
+    is_wearing = Column("IsWearing", Boolean, nullable=False)
+    record_hash = Column("RecordHash", String(64), nullable=False)
@@ -0,0 +1,111 @@
+"""Request payload validation for uploaded health metric batches."""
+
+import fastjsonschema
+import numpy as np
+
+# Allowed [lo, hi] range per optional numeric field. Kept out of the JSON
+# schema so the whole batch can be range-checked in one vectorized pass.
+NUM_RANGES = {
+    'heartRate': (30, 220),
+    'bpSystolic': (60, 280),
+    'bpDiastolic': (30, 200),
+    'spO2': (50, 100),
+    'steps': (0, 100000),
+    'calories': (0, 20000),
+    'distance': (0, 200000),
+    'temperature': (30.0, 45.0),
+    'bloodGlucose': (1.0, 35.0),
+    'totalSleep': (0, 1440),
+    'deepSleep': (0, 1440),
+    'lightSleep': (0, 1440),
+    'stress': (0, 100),
+    'met': (0.0, 30.0),
+    'mai': (0, 100),
+}
+
+_RANGE_FIELDS = tuple(NUM_RANGES)
+_RANGE_LO = np.array([NUM_RANGES[field][0] for field in _RANGE_FIELDS], dtype=np.float64)
+_RANGE_HI = np.array([NUM_RANGES[field][1] for field in _RANGE_FIELDS], dtype=np.float64)
+
+_INT_FIELDS = ('heartRate', 'bpSystolic', 'bpDiastolic', 'spO2', 'steps',
+               'calories', 'distance', 'totalSleep', 'deepSleep', 'lightSleep',
+               'stress', 'mai')
+_FLOAT_FIELDS = ('temperature', 'bloodGlucose', 'met')
+
+# Epoch millis for 9999-12-31T23:59:59.999Z — the last instant datetime
+# (and the SQL Server datetime2 column) can represent. Anything above is
+# rejected up front; huge values would otherwise overflow the int64 batch
+# conversion or die at the driver with a confusing per-row error.
+TIMESTAMP_MAX_MS = 253402300799999
+
+METRIC_SCHEMA = {
+    'type': 'object',
+    'required': ['userId', 'deviceId', 'timestamp', 'isWearing', 'recordHash'],
+    'properties': {
+        'userId': {'type': 'string', 'minLength': 1},
+        'deviceId': {'type': 'string', 'minLength': 1},
+        'timestamp': {'type': 'integer', 'minimum': 1, 'maximum': TIMESTAMP_MAX_MS},
+        'isWearing': {'type': 'boolean'},
+        'recordHash': {'type': 'string', 'minLength': 64, 'maxLength': 64},
+        **{field: {'type': ['integer', 'null']} for field in _INT_FIELDS},
+        **{field: {'type': ['number', 'null']} for field in _FLOAT_FIELDS},
+    },
+}
+
+# Compiled once at import; fastjsonschema emits specialized straight-line
+# Python for the schema, replacing the old ~20-branch if-ladder per record.
+_check_metric = fastjsonschema.compile(METRIC_SCHEMA)
+
+_FIELD_INDEX = {field: j for j, field in enumerate(_RANGE_FIELDS)}
+
+# Error templates formatted only on failure; the range templates bake the
+# field name and bounds in at import, leaving just the record index.
+_ERR_NOT_OBJECT = "Record %d: not an object"
+_ERR_SCHEMA = "Record %d: %s"
+_ERR_RANGE = {
+    field: "Record %%d: %s out of range [%s, %s]" % (field, lo, hi)
+    for field, (lo, hi) in NUM_RANGES.items()
+}
+
+
+def validate_metric(metric, index):
+    """Validate a single metric dict, returning a list of error strings."""
+    if not isinstance(metric, dict):
+        return [_ERR_NOT_OBJECT % index]
+    try:
+        _check_metric(metric)
+    except fastjsonschema.JsonSchemaValueException as e:
+        return [_ERR_SCHEMA % (index, e.message)]
+    return []
+
+
+def _range_errors(metrics):
+    """Range-check every numeric field of the batch in one vectorized pass."""
+    values = np.full((len(metrics), len(_RANGE_FIELDS)), np.nan, dtype=np.float64)
+    for i, metric in enumerate(metrics):
+        if not isinstance(metric, dict):
+            continue
+        # Walk the record's own keys so absent/sparse fields cost nothing.
+        for field, value in metric.items():
+            j = _FIELD_INDEX.get(field)
+            if j is not None and isinstance(value, (int, float)) \
+                    and not isinstance(value, bool):
+                values[i, j] = value
+
+    # NaN (missing/null) compares False on both sides, so it never flags.
+    with np.errstate(invalid='ignore'):
+        violations = (values < _RANGE_LO) | (values > _RANGE_HI)
+
+    errors = []
+    for i, j in zip(*np.nonzero(violations)):
+        errors.append(_ERR_RANGE[_RANGE_FIELDS[j]] % i)
+    return errors
+
+
+def validate_batch(metrics):
+    """Validate every metric in the batch, returning accumulated errors."""
+    errors = []
+    for index, metric in enumerate(metrics):
+        errors.extend(validate_metric(metric, index))
+    errors.extend(_range_errors(metrics))
+    return errors